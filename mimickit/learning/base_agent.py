@@ -93,6 +93,11 @@ class BaseAgent(torch.nn.Module):
             
             self._iter += 1
 
+        # Upload pending videos while the logger is still active
+        video_recorder = self._env._engine.get_video_recorder()
+        if video_recorder:
+            video_recorder.close()
+
         return
 
     def test_model(self, num_episodes):
@@ -149,6 +149,10 @@ def run(rank, num_procs, device, master_port, args):
         test_episodes = args.parse_int("test_episodes", np.iinfo(np.int64).max)
         test(agent=agent, test_episodes=test_episodes)
 
+        video_recorder = env._engine.get_video_recorder()
+        if (video_recorder):
+            video_recorder.close()
+
     else:
         assert(False), "Unsupported mode: {}".format(mode)
 
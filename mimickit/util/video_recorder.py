@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import atexit
+import concurrent.futures
+import io
 import numpy as np
 import os
-import tempfile
 from typing import TYPE_CHECKING, Any
 import wandb
-from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
 
 from util.logger import Logger
 
@@ -22,6 +23,11 @@ class VideoRecorder:
 
     The recorder manages its own camera controls, independent of the environment's
     visualization camera. This allows recording without interfering with visualization.
+
+    Encoding is done on a background thread. Finished videos are uploaded from the
+    calling thread on the next capture_frame(), at the logger's current step, so that
+    uploads stay ordered with the training logs. Call close() at the end of training to
+    upload any pending videos.
     
     Args:
         engine: The simulation engine (e.g. IsaacLabEngine).
@@ -49,12 +55,18 @@ class VideoRecorder:
 
         self._recorded_frames: list[np.ndarray] = []
         self._recording: bool = False
+        self._dropped_warmup_frames: int = 0
 
         self._annotator: Any | None = None
         self._render_product: Any | None = None
 
         self._logger_step_tracker: Any | None = None
 
+        # Encoding runs on a background worker so the training loop does not stall
+        self._io_pool: concurrent.futures.ThreadPoolExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._pending: list[tuple[concurrent.futures.Future, int]] = []
+        atexit.register(self.close)
+
         return
 
     def _build_camera(self) -> str:
@@ -118,13 +130,13 @@ class VideoRecorder:
 
         rgb_data: Any = self._annotator.get_data()
         if rgb_data is None or rgb_data.size == 0:
-            # Renderer still warming up
-            frame: np.ndarray = np.zeros((self._resolution[1], self._resolution[0], 3), dtype=np.uint8)
+            # Renderer still warming up, skip the frame
+            self._dropped_warmup_frames += 1
         else:
-            frame = np.frombuffer(rgb_data, dtype=np.uint8).reshape(*rgb_data.shape)
-            frame = frame[:, :, :3]  # drop alpha channel
-
-        self._recorded_frames.append(frame)
+            src = np.frombuffer(rgb_data, dtype=np.uint8).reshape(*rgb_data.shape)
+            # Drop alpha channel, copying once into an owned contiguous frame
+            frame: np.ndarray = np.ascontiguousarray(src[:, :, :3])
+            self._recorded_frames.append(frame)
         
         # Restore visualization camera state
         self._camera_state.set_position_world(saved_pos, True)
@@ -139,12 +151,15 @@ class VideoRecorder:
             self.stop_recording()
         
         self._recorded_frames = []
+        self._dropped_warmup_frames = 0
         self._recording = True
         Logger.print("[VideoRecorder] Started recording")
         return
 
     def capture_frame(self) -> None:
-        """Capture a frame during recording. Call this each step while recording."""
+        """Capture a frame during recording and upload any finished videos. Call this each step."""
+        self._upload_finished_videos()
+
         if self._recording:
             self._capture_frame()
         return
@@ -158,37 +173,95 @@ class VideoRecorder:
         return
 
     def _stop_recording(self) -> None:
-        """Stop recording, create video, upload to WandB, and clean up."""
+        """Stop recording and hand the recorded frames to the background encoding worker."""
+        if self._dropped_warmup_frames > 0:
+            Logger.print("[VideoRecorder] Skipped {} frames while renderer was warming up".format(
+                self._dropped_warmup_frames))
+            self._dropped_warmup_frames = 0
+
         if not self._recording or len(self._recorded_frames) == 0:
             self._recording = False
             return
 
         self._recording = False
 
-        try:
-            if len(self._recorded_frames) == 0:
-                Logger.print("[VideoRecorder] No frames recorded, skipping video creation")
-                return
+        frames: list[np.ndarray] = self._recorded_frames
+        self._recorded_frames = []
 
-            clip: ImageSequenceClip = ImageSequenceClip(self._recorded_frames, fps=self._fps)
+        future = self._io_pool.submit(self._encode_video, frames)
+        self._pending.append((future, len(frames)))
+        return
 
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=True) as tmp:
-                temp_path: str = tmp.name
-            
-                clip.write_videofile(temp_path, logger=None)
-                if wandb.run is not None:
-                    step_val = self._logger_step_tracker.get_current_step()
-                    wandb.log({
-                        "video": wandb.Video(temp_path, format="mp4"),
-                    }, step=step_val)
-                    Logger.print("[VideoRecorder] Uploaded video to WandB ({} frames, step {})".format(
-                        len(self._recorded_frames), step_val))
-                else:
+    def _upload_finished_videos(self, wait: bool = False) -> None:
+        """Upload videos whose encoding has finished.
+
+        Runs on the calling (training) thread so that wandb.log is never called concurrently,
+        and uses the logger's current step, since WandB drops logs with steps older than the run's.
+        """
+        remaining: list[tuple[concurrent.futures.Future, int]] = []
+        for future, num_frames in self._pending:
+            if not wait and not future.done():
+                remaining.append((future, num_frames))
+                continue
+
+            try:
+                video_buf: io.BytesIO = future.result()
+
+                if wandb.run is None:
                     Logger.print("[VideoRecorder] WandB not initialized, skipping upload")
-        except ImportError as e:
-            Logger.print("[VideoRecorder] Missing dependency: {}. Video not saved.".format(e))
-        except Exception as e:
-            Logger.print("[VideoRecorder] Error creating video: {}".format(e))
+                    continue
 
-        self._recorded_frames = []
+                step_val = None
+                if self._logger_step_tracker is not None:
+                    step_val = self._logger_step_tracker.get_current_step()
+
+                wandb.log({
+                    "video": wandb.Video(video_buf, format="mp4"),
+                }, step=step_val)
+                Logger.print("[VideoRecorder] Uploaded video to WandB ({} frames, step {})".format(
+                    num_frames, step_val))
+            except ImportError as e:
+                Logger.print("[VideoRecorder] Missing dependency: {}. Video not saved.".format(e))
+            except Exception as e:
+                Logger.print("[VideoRecorder] Error creating video: {}".format(e))
+
+        self._pending = remaining
+        return
+
+    def _encode_video(self, frames: list[np.ndarray]) -> io.BytesIO:
+        """Encode RGB frames into an in-memory H.264 mp4."""
+        import av  # optional dependency, only needed when videos are recorded
+
+        height, width = frames[0].shape[:2]
+        video_buf = io.BytesIO()
+
+        with av.open(video_buf, mode="w", format="mp4") as container:
+            stream = container.add_stream("h264", rate=self._fps)
+            stream.width = width
+            stream.height = height
+            stream.pix_fmt = "yuv420p"
+            stream.options = {"preset": "ultrafast", "tune": "zerolatency"}
+            # Fixed GOP of one keyframe per second
+            stream.codec_context.gop_size = self._fps
+
+            for frame in frames:
+                video_frame = av.VideoFrame.from_ndarray(frame, format="rgb24")
+                for packet in stream.encode(video_frame):
+                    container.mux(packet)
+
+            # Flush buffered packets
+            for packet in stream.encode():
+                container.mux(packet)
+
+        video_buf.seek(0)
+        return video_buf
+
+    def close(self) -> None:
+        """Wait for pending videos to finish encoding and upload them.
+
+        Call this before the logger or WandB is shut down. The atexit hook is only a backstop,
+        since it may run after WandB has already finished the run.
+        """
+        self._upload_finished_videos(wait=True)
+        self._io_pool.shutdown(wait=True)
         return
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify
 import sys
 import os
+import hashlib
+import tempfile
+import threading
 import numpy as np
 
+import orjson
 import torch
 import pickle
 
@@ -22,20 +26,275 @@ app = Flask(__name__)
 MOTION_DIR = os.path.join(os.path.dirname(__file__), '../../data/motions')
 ASSET_DIR = os.path.join(os.path.dirname(__file__), '../../data/assets')
 
-# Cache for character models
+# Files larger than this only return metadata from the raw data endpoint
+MAX_RAW_BYTES = 64 * 1024 * 1024
+
+# Device used for forward kinematics
+FK_DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Compile the viewer's forward kinematics when supported
+USE_TORCH_COMPILE = hasattr(torch, 'compile') and torch.__version__ >= '2.1'
+
+# Cache for character models and their skeleton structure, keyed by (character_name, device)
 _character_models = {}
 
-def get_character_model(character_name):
-    """Load or retrieve cached character model."""
-    if character_name not in _character_models:
-        xml_path = os.path.join(ASSET_DIR, character_name, f"{character_name}.xml")
-        if os.path.exists(xml_path):
-            model = MJCFCharModel(device='cpu')
+# Cached index of motion files, rebuilt when any motion directory is modified
+_motion_index = {'dir_mtimes': {}, 'files': []}
+
+# Cache for parsed character joint hierarchies
+_character_joints = {}
+
+# Lock for loading character models from concurrent requests
+_character_models_lock = threading.Lock()
+
+# On-disk cache for forward kinematics results in a private per-user directory. Each entry is
+# a JSON header line with the source mtimes, followed by the serialized skeleton JSON.
+_skeleton_cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'mimickit', 'fk')
+
+# Per cache entry locks, so concurrent requests for one motion compute it only once
+_skeleton_cache_locks = {}
+_skeleton_cache_locks_guard = threading.Lock()
+
+def get_character_xml_path(character_name):
+    return os.path.join(ASSET_DIR, character_name, f"{character_name}.xml")
+
+def get_skeleton_cache_path(filepath, character_name):
+    """Cache file path keyed by motion file and character, so edits overwrite the same entry."""
+    key_str = f"{filepath}:{character_name}"
+    key = hashlib.blake2b(key_str.encode()).hexdigest()
+    return os.path.join(_skeleton_cache_dir, f"{key}.fk")
+
+def get_skeleton_source_mtimes(filepath, character_name):
+    """Mtimes of the motion file and character XML that a cache entry was computed from."""
+    xml_path = get_character_xml_path(character_name)
+    return [os.path.getmtime(filepath), os.path.getmtime(xml_path)]
+
+def get_skeleton_cache_lock(cache_path):
+    with _skeleton_cache_locks_guard:
+        if cache_path not in _skeleton_cache_locks:
+            _skeleton_cache_locks[cache_path] = threading.Lock()
+        return _skeleton_cache_locks[cache_path]
+
+def load_skeleton_cache(cache_path, source_mtimes):
+    """Return cached JSON bytes, or None on a cache miss or if the sources have changed."""
+    try:
+        with open(cache_path, 'rb') as f:
+            header = orjson.loads(f.readline())
+            if header.get('mtimes') != source_mtimes:
+                return None
+            return f.read()
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+def save_skeleton_cache(cache_path, source_mtimes, skeleton_json):
+    """Atomically write serialized skeleton data to the cache, replacing any stale entry."""
+    os.makedirs(_skeleton_cache_dir, mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=_skeleton_cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps({'mtimes': source_mtimes}))
+            f.write(b'\n')
+            f.write(skeleton_json)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def scan_motion_files(motion_dir):
+    """Recursively collect .pkl motion files, along with the mtime of every scanned directory."""
+    dir_mtimes = {}
+    motion_files = []
+    stack = [motion_dir]
+    
+    while stack:
+        curr_dir = stack.pop()
+        try:
+            dir_mtimes[curr_dir] = os.stat(curr_dir).st_mtime
+            with os.scandir(curr_dir) as it:
+                for entry in it:
+                    # Directory symlinks are not followed, matching os.walk
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith('.pkl'):
+                        motion_files.append(os.path.relpath(entry.path, motion_dir))
+        except OSError:
+            # Skip unreadable or removed directories, as os.walk does
+            continue
+    
+    motion_files.sort()
+    return dir_mtimes, motion_files
+
+def is_motion_index_valid(motion_index):
+    """The index is valid while none of the scanned directories have been modified."""
+    if not motion_index['dir_mtimes']:
+        return False
+    try:
+        return all(os.stat(d).st_mtime == mtime for d, mtime in motion_index['dir_mtimes'].items())
+    except OSError:
+        return False
+
+def orjson_response(data):
+    """Serialize data (including numpy arrays) directly to a JSON response."""
+    return Response(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY), mimetype='application/json')
+
+def get_character_model(character_name, device=FK_DEVICE):
+    """Load or retrieve cached character model along with its body names and parent indices.
+    
+    The model is reloaded if the character XML has been modified since it was cached.
+    """
+    key = (character_name, device)
+    xml_path = get_character_xml_path(character_name)
+    if not os.path.exists(xml_path):
+        return None
+    
+    xml_mtime = os.path.getmtime(xml_path)
+    with _character_models_lock:
+        entry = _character_models.get(key)
+        if entry is None or entry['xml_mtime'] != xml_mtime:
+            model = MJCFCharModel(device=device)
             model.load(xml_path)
-            _character_models[character_name] = model
+            body_names = model.get_body_names()
+            parent_indices = np.array([model.get_parent_id(i) for i in range(len(body_names))], dtype=np.int32)
+            entry = {
+                'model': model,
+                'body_names': body_names,
+                'parent_indices': parent_indices,
+                'forward_batch': build_forward_batch(model, device),
+                'xml_mtime': xml_mtime
+            }
+            _character_models[key] = entry
+    return entry
+
+def build_forward_batch(char_model, device):
+    """Compile joint DOF to rotation conversion and FK into one function, falling back to eager."""
+    def forward_batch(root_pos, root_rot, joint_dof):
+        joint_rot = char_model.dof_to_rot(joint_dof)
+        return char_model.forward_kinematics(root_pos, root_rot, joint_rot)
+    
+    if not USE_TORCH_COMPILE:
+        return forward_batch
+    
+    try:
+        # torch.compile raises eagerly on unsupported platforms or Python versions
+        compiled_fn = torch.compile(forward_batch, dynamic=True)
+        
+        # Warm up so that request latency does not include compilation
+        num_frames = 2
+        root_pos = torch.zeros((num_frames, 3), device=device)
+        root_rot = torch.zeros((num_frames, 4), device=device)
+        root_rot[..., -1] = 1
+        joint_dof = torch.zeros((num_frames, char_model.get_dof_size()), device=device)
+        compiled_fn(root_pos, root_rot, joint_dof)
+    except Exception as e:
+        print(f"torch.compile failed, using eager forward kinematics: {e}")
+        return forward_batch
+    
+    use_compiled = True
+    def safe_forward_batch(root_pos, root_rot, joint_dof):
+        # Recompiles for new shapes can still fail, fall back to eager permanently if they do
+        nonlocal use_compiled
+        if use_compiled:
+            try:
+                return compiled_fn(root_pos, root_rot, joint_dof)
+            except Exception as e:
+                print(f"Compiled forward kinematics failed, using eager forward kinematics: {e}")
+                use_compiled = False
+        return forward_batch(root_pos, root_rot, joint_dof)
+    
+    return safe_forward_batch
+
+def parse_character_joints(xml_path):
+    """Parse the joint hierarchy under worldbody in a single streaming pass.
+    
+    Joints are returned in the same order as a recursive traversal: all of a body's own
+    joints, followed by the joints of each child body. Since a body's joints may appear
+    after its child bodies in the file, each body's output is buffered until the body ends.
+    """
+    joints = []
+    body_stack = []
+    worldbody_depth = 0
+    
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if tag == 'worldbody':
+                worldbody_depth += 1
+            elif tag == 'body' and worldbody_depth > 0:
+                body_pos = elem.get('pos', '0 0 0')
+                body_stack.append({
+                    'name': elem.get('name'),
+                    'pos': [float(x) for x in body_pos.split()],
+                    'joints': [],
+                    'child_joints': []
+                })
+            elif tag == 'joint' and len(body_stack) > 0:
+                body = body_stack[-1]
+                parent_name = body_stack[-2]['name'] if len(body_stack) > 1 else None
+                joint_axis = elem.get('axis', '1 0 0')
+                joint_range = elem.get('range', '-180 180')
+                
+                body['joints'].append({
+                    'name': elem.get('name'),
+                    'body': body['name'],
+                    'parent': parent_name,
+                    'axis': [float(x) for x in joint_axis.split()],
+                    'range': [float(x) for x in joint_range.split()],
+                    'pos': body['pos']
+                })
         else:
-            return None
-    return _character_models[character_name]
+            if tag == 'worldbody':
+                worldbody_depth -= 1
+            elif tag == 'body' and worldbody_depth > 0:
+                body = body_stack.pop()
+                body_joints = body['joints'] + body['child_joints']
+                if len(body_stack) > 0:
+                    body_stack[-1]['child_joints'].extend(body_joints)
+                else:
+                    joints.extend(body_joints)
+                elem.clear()
+    
+    return joints
+
+def get_character_joints(xml_path):
+    """Load or retrieve cached joint hierarchy, keyed by file path and mtime."""
+    key = (xml_path, os.path.getmtime(xml_path))
+    if key not in _character_joints:
+        _character_joints[key] = parse_character_joints(xml_path)
+    return _character_joints[key]
+
+def compute_skeleton_json(filepath, character_name):
+    """Run forward kinematics for all frames of a motion and serialize the skeleton data."""
+    char_entry = get_character_model(character_name)
+    if char_entry is None:
+        raise FileNotFoundError(f"Character model not found for {character_name}")
+    
+    # Load motion
+    motion = load_motion(filepath)
+    
+    # Compute forward kinematics for all frames in a single batch
+    frames_t = torch.from_numpy(np.asarray(motion.frames, dtype=np.float32)).to(FK_DEVICE, non_blocking=True)
+    root_pos = frames_t[:, 0:3]
+    root_rot_exp = frames_t[:, 3:6]
+    joint_dof = frames_t[:, 6:]
+    
+    root_rot = torch_util.exp_map_to_quat(root_rot_exp)
+    body_pos_all, body_rot_all = char_entry['forward_batch'](root_pos, root_rot, joint_dof)
+    
+    # (num_frames, num_bodies, 3) nested list in a single call
+    frames_skeleton = body_pos_all.cpu().numpy().tolist()
+    
+    # Get skeleton structure
+    body_names = char_entry['body_names']
+    parent_indices = char_entry['parent_indices'].tolist()
+    
+    skeleton_data = {
+        "body_names": body_names,
+        "parent_indices": parent_indices,
+        "frames": frames_skeleton,
+        "num_bodies": len(body_names)
+    }
+    return orjson.dumps(skeleton_data)
 
 @app.route('/')
 def index():
@@ -44,16 +303,16 @@ def index():
 @app.route('/api/motions')
 def list_motions():
     """List all available motion files."""
-    motion_files = []
-    
-    for root, dirs, files in os.walk(MOTION_DIR):
-        for file in files:
-            if file.endswith('.pkl'):
-                rel_path = os.path.relpath(os.path.join(root, file), MOTION_DIR)
-                motion_files.append(rel_path)
+    global _motion_index
     
-    motion_files.sort()
-    return jsonify(motion_files)
+    # Work on a snapshot and swap in a rebuilt index with a single assignment,
+    # so concurrent requests never see mtimes and files from different scans
+    motion_index = _motion_index
+    if not is_motion_index_valid(motion_index):
+        dir_mtimes, files = scan_motion_files(MOTION_DIR)
+        motion_index = {'dir_mtimes': dir_mtimes, 'files': files}
+        _motion_index = motion_index
+    return orjson_response(motion_index['files'])
 
 # NOTE: More specific routes must come before generic ones
 @app.route('/api/motion/<path:filename>/skeleton')
@@ -69,49 +328,22 @@ def get_motion_skeleton(filename):
         parts = filename.split('/')
         character_name = parts[0] if len(parts) > 0 else 'humanoid'
         
-        # Load character model
-        char_model = get_character_model(character_name)
-        if char_model is None:
+        if not os.path.exists(get_character_xml_path(character_name)):
             return jsonify({"error": f"Character model not found for {character_name}"}), 404
         
-        # Load motion
-        motion = load_motion(filepath)
+        # Cache hits are served without taking a lock
+        cache_path = get_skeleton_cache_path(filepath, character_name)
+        source_mtimes = get_skeleton_source_mtimes(filepath, character_name)
+        skeleton_json = load_skeleton_cache(cache_path, source_mtimes)
+        if skeleton_json is None:
+            with get_skeleton_cache_lock(cache_path):
+                # Another request may have filled the cache while waiting for the lock
+                skeleton_json = load_skeleton_cache(cache_path, source_mtimes)
+                if skeleton_json is None:
+                    skeleton_json = compute_skeleton_json(filepath, character_name)
+                    save_skeleton_cache(cache_path, source_mtimes, skeleton_json)
         
-        # Extract pose data and compute forward kinematics for all frames
-        frames_skeleton = []
-        for frame in motion.frames:
-            # Extract root pos, root rot (exp map), joint dof
-            root_pos = torch.tensor(frame[0:3], dtype=torch.float32)
-            root_rot_exp = torch.tensor(frame[3:6], dtype=torch.float32)
-            joint_dof = torch.tensor(frame[6:], dtype=torch.float32)
-            
-            # Convert exponential map to quaternion
-            root_rot = torch_util.exp_map_to_quat(root_rot_exp.unsqueeze(0)).squeeze(0)
-            
-            # Convert joint DOF to rotations
-            joint_rot = char_model.dof_to_rot(joint_dof.unsqueeze(0)).squeeze(0)
-            
-            # Forward kinematics
-            body_pos, body_rot = char_model.forward_kinematics(
-                root_pos.unsqueeze(0),
-                root_rot.unsqueeze(0),
-                joint_rot.unsqueeze(0)
-            )
-            
-            # Convert to list (ensure Python native types)
-            body_pos = body_pos.squeeze(0).cpu().numpy()
-            frames_skeleton.append([[float(x) for x in pos] for pos in body_pos])
-        
-        # Get skeleton structure
-        body_names = char_model.get_body_names()
-        parent_indices = [int(char_model.get_parent_id(i)) for i in range(len(body_names))]
-        
-        return jsonify({
-            "body_names": body_names,
-            "parent_indices": parent_indices,
-            "frames": frames_skeleton,
-            "num_bodies": len(body_names)
-        })
+        return Response(skeleton_json, mimetype='application/json')
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -126,18 +358,33 @@ def get_motion_raw(filename):
         return jsonify({"error": "File not found"}), 404
     
     try:
+        file_size = os.path.getsize(filepath)
+        include_data = file_size <= MAX_RAW_BYTES
+        
         with open(filepath, 'rb') as f:
             raw_data = pickle.load(f)
         
-        # Convert numpy arrays to lists for JSON serialization
+        # Numeric numpy arrays are serialized directly by orjson, without an intermediate list.
+        # For large files only metadata is returned to bound the response size.
         serializable_data = {}
         for key, value in raw_data.items():
             if hasattr(value, 'tolist'):
-                serializable_data[key] = {
+                entry = {
                     'type': 'numpy.ndarray',
                     'shape': list(value.shape) if hasattr(value, 'shape') else None,
                     'dtype': str(value.dtype) if hasattr(value, 'dtype') else None,
-                    'data': value.tolist()
+                    'size': int(value.size) if hasattr(value, 'size') else None
+                }
+                if include_data:
+                    if isinstance(value, np.ndarray) and value.dtype.kind in 'biuf':
+                        entry['data'] = np.ascontiguousarray(value)
+                    else:
+                        entry['data'] = value.tolist()
+                serializable_data[key] = entry
+            elif not include_data and isinstance(value, (list, tuple, dict)):
+                serializable_data[key] = {
+                    'type': type(value).__name__,
+                    'size': len(value)
                 }
             else:
                 serializable_data[key] = {
@@ -145,7 +392,7 @@ def get_motion_raw(filename):
                     'value': value
                 }
         
-        return jsonify(serializable_data)
+        return orjson_response(serializable_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -161,10 +408,10 @@ def get_motion(filename):
         motion = load_motion(filepath)
         file_size = os.path.getsize(filepath)
         
-        return jsonify({
+        return orjson_response({
             "fps": int(motion.fps),
             "loop_mode": int(motion.loop_mode.value),
-            "frames": motion.frames.tolist(),
+            "frames": motion.frames,
             "num_frames": motion.frames.shape[0],
             "duration": motion.get_length(),
             "file_size": file_size
@@ -181,40 +428,7 @@ def get_character(character_name):
         return jsonify({"error": "Character XML not found"}), 404
     
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        # Parse joint hierarchy
-        joints = []
-        def parse_body(body_elem, parent_name=None, depth=0):
-            body_name = body_elem.get('name')
-            body_pos = body_elem.get('pos', '0 0 0')
-            pos = [float(x) for x in body_pos.split()]
-            
-            # Get joints in this body
-            for joint_elem in body_elem.findall('joint'):
-                joint_name = joint_elem.get('name')
-                joint_axis = joint_elem.get('axis', '1 0 0')
-                joint_range = joint_elem.get('range', '-180 180')
-                
-                joints.append({
-                    'name': joint_name,
-                    'body': body_name,
-                    'parent': parent_name,
-                    'axis': [float(x) for x in joint_axis.split()],
-                    'range': [float(x) for x in joint_range.split()],
-                    'pos': pos
-                })
-            
-            # Recursively process child bodies
-            for child_body in body_elem.findall('body'):
-                parse_body(child_body, body_name, depth + 1)
-        
-        # Find worldbody and parse
-        worldbody = root.find('worldbody')
-        if worldbody is not None:
-            for body in worldbody.findall('body'):
-                parse_body(body)
+        joints = get_character_joints(xml_path)
         
         return jsonify({
             "character": character_name,
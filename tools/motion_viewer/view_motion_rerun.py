@@ -20,7 +20,7 @@ import torch
 try:
     import rerun as rr
 except ImportError:
-    print("Rerun not installed. Install with: pip install rerun-sdk")
+    print("Rerun not installed. Install with: pip install \"rerun-sdk>=0.22\"")
     sys.exit(1)
 
 def visualize_motion(motion_file, character_file, speed=1.0, save_file=None):
@@ -33,7 +33,8 @@ def visualize_motion(motion_file, character_file, speed=1.0, save_file=None):
     
     # Load character model
     print(f"Loading character: {character_file}")
-    char_model = MJCFCharModel(device='cpu')
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    char_model = MJCFCharModel(device=device)
     char_model.load(character_file)
     body_names = char_model.get_body_names()
     print(f"  Bodies: {len(body_names)}")
@@ -64,96 +65,94 @@ def visualize_motion(motion_file, character_file, speed=1.0, save_file=None):
 """), static=True)
     
     # Get parent indices for bones
-    parent_indices = [char_model.get_parent_id(i) for i in range(len(body_names))]
+    parent_indices = np.array([char_model.get_parent_id(i) for i in range(len(body_names))], dtype=np.int32)
+    bone_child_idx = np.nonzero(parent_indices >= 0)[0]
+    bone_child_idx = bone_child_idx[bone_child_idx > 0]
+    bone_parent_idx = parent_indices[bone_child_idx]
     
-    # Process each frame
+    # Compute forward kinematics for all frames in a single batch
+    frames_np = np.asarray(motion.frames, dtype=np.float32)
+    frames_t = torch.from_numpy(frames_np).to(device, non_blocking=True)
+    root_pos_all = frames_t[:, 0:3]
+    root_rot_all = torch_util.exp_map_to_quat(frames_t[:, 3:6])
+    joint_dof_all = frames_t[:, 6:]
+    joint_rot_all = char_model.dof_to_rot(joint_dof_all)
+    body_pos_all, body_rot_all = char_model.forward_kinematics(root_pos_all, root_rot_all, joint_rot_all)
+    
+    body_pos_all = body_pos_all.cpu().numpy()
+    body_rot_all = body_rot_all.cpu().numpy()
+    
+    # Root trajectory metrics for all frames
+    root_xyz = frames_np[:, 0:3]
+    heights = root_xyz[:, 2]
+    velocities = np.linalg.norm(np.diff(root_xyz, axis=0), axis=1) * motion.fps
+    
+    num_frames = frames_np.shape[0]
+    num_bodies = len(body_names)
+    num_bones = len(bone_child_idx)
+    frame_times = rr.TimeSequenceColumn("frame", np.arange(num_frames))
+    
+    # Upload the whole motion with columnar sends instead of logging frame by frame
     print("\nVisualizing motion...")
-    for frame_idx, frame in enumerate(motion.frames):
-        # Set timeline
-        rr.set_time_sequence("frame", frame_idx)
-        
-        # Extract pose data
-        root_pos = torch.tensor(frame[0:3], dtype=torch.float32)
-        root_rot_exp = torch.tensor(frame[3:6], dtype=torch.float32)
-        joint_dof = torch.tensor(frame[6:], dtype=torch.float32)
-        
-        # Convert to quaternions
-        root_rot = torch_util.exp_map_to_quat(root_rot_exp.unsqueeze(0)).squeeze(0)
-        joint_rot = char_model.dof_to_rot(joint_dof.unsqueeze(0)).squeeze(0)
-        
-        # Forward kinematics
-        body_pos, body_rot = char_model.forward_kinematics(
-            root_pos.unsqueeze(0),
-            root_rot.unsqueeze(0),
-            joint_rot.unsqueeze(0)
-        )
-        
-        body_pos = body_pos.squeeze(0).cpu().numpy()
-        body_rot = body_rot.squeeze(0).cpu().numpy()
-        
-        # Log joint positions as 3D points with labels
-        joint_positions = body_pos
-        joint_colors = [[255, 100, 100] if i == 0 else [100, 150, 255] for i in range(len(joint_positions))]
-        rr.log("skeleton/joints", rr.Points3D(
-            joint_positions,
-            radii=0.05,
-            colors=joint_colors,
-            labels=body_names
-        ))
-        
-        # Log bones as line segments
-        bone_starts = []
-        bone_ends = []
-        for i in range(1, len(body_names)):
-            parent_idx = parent_indices[i]
-            if parent_idx >= 0:
-                bone_starts.append(body_pos[parent_idx])
-                bone_ends.append(body_pos[i])
-        
-        if bone_starts:
-            rr.log("skeleton/bones", rr.LineStrips3D(
-                [np.stack([bone_starts[i], bone_ends[i]]) for i in range(len(bone_starts))],
-                colors=[150, 180, 255],
-                radii=0.02
-            ))
-        
-        # Log transforms for each body (shows coordinate frames)
-        for i, (name, pos, rot) in enumerate(zip(body_names, body_pos, body_rot)):
-            # Convert quaternion from [x,y,z,w] to [w,x,y,z] for Rerun
-            rot_rerun = [rot[3], rot[0], rot[1], rot[2]]
-            rr.log(f"skeleton/transforms/{name}", rr.Transform3D(
-                translation=pos,
-                rotation=rr.Quaternion(xyzw=rot_rerun),
-                axis_length=0.1 if i == 0 else 0.05
-            ))
-        
-        # Log root trajectory (path over time)
-        if frame_idx > 0:
-            prev_root_pos = torch.tensor(motion.frames[frame_idx-1][0:3], dtype=torch.float32).numpy()
-            rr.log("trajectory/root", rr.LineStrips3D(
-                [[prev_root_pos, root_pos.numpy()]],
-                colors=[255, 200, 0],
-                radii=0.015
-            ))
-        
-        # Log velocity (as scalar time series)
-        if frame_idx > 0:
-            prev_frame = motion.frames[frame_idx - 1]
-            prev_root_pos = torch.tensor(prev_frame[0:3], dtype=torch.float32)
-            velocity = np.linalg.norm((root_pos - prev_root_pos).numpy()) * motion.fps
-            rr.log("metrics/velocity", rr.Scalar(velocity))
-        
-        # Log height
-        rr.log("metrics/height", rr.Scalar(root_pos[2].item()))
-        
-        # Log joint angles (first 3 for demo)
-        for i in range(min(3, len(joint_dof))):
-            rr.log(f"metrics/joint_{i}", rr.Scalar(joint_dof[i].item()))
+    
+    # Log root trajectory (full path as a single polyline)
+    rr.log("trajectory/root", rr.LineStrips3D(
+        [root_xyz],
+        colors=[255, 200, 0],
+        radii=0.015
+    ), static=True)
+    
+    # Log joint positions as 3D points with labels, styling is static and positions vary per frame
+    joint_colors = [[255, 100, 100] if i == 0 else [100, 150, 255] for i in range(num_bodies)]
+    rr.log("skeleton/joints", rr.Points3D.from_fields(
+        radii=0.05,
+        colors=joint_colors,
+        labels=body_names
+    ), static=True)
+    rr.send_columns("skeleton/joints", [frame_times], rr.Points3D.columns(
+        positions=body_pos_all.reshape(num_frames * num_bodies, 3)
+    ).partition([num_bodies] * num_frames))
+    
+    # Log bones as line segments
+    if num_bones > 0:
+        bone_segs = np.stack([body_pos_all[:, bone_parent_idx], body_pos_all[:, bone_child_idx]], axis=2)
+        rr.log("skeleton/bones", rr.LineStrips3D.from_fields(
+            colors=[150, 180, 255],
+            radii=0.02
+        ), static=True)
+        rr.send_columns("skeleton/bones", [frame_times], rr.LineStrips3D.columns(
+            strips=bone_segs.reshape(num_frames * num_bones, 2, 3)
+        ).partition([num_bones] * num_frames))
+    
+    # Log coordinate frames for all bodies, unit axes are instanced once per body
+    rr.log("skeleton/bodies", rr.Arrows3D(
+        vectors=np.eye(3, dtype=np.float32),
+        colors=[[255, 0, 0], [0, 255, 0], [0, 0, 255]]
+    ), static=True)
+    body_axis_scales = np.full((num_bodies, 3), 0.05, dtype=np.float32)
+    body_axis_scales[0] = 0.1
+    rr.log("skeleton/bodies", rr.InstancePoses3D(scales=body_axis_scales), static=True)
+    rr.send_columns("skeleton/bodies", [frame_times], rr.InstancePoses3D.columns(
+        translations=body_pos_all.reshape(num_frames * num_bodies, 3),
+        quaternions=body_rot_all.reshape(num_frames * num_bodies, 4)
+    ).partition([num_bodies] * num_frames))
+    
+    # Log velocity (as scalar time series)
+    if num_frames > 1:
+        rr.send_columns("metrics/velocity", [rr.TimeSequenceColumn("frame", np.arange(1, num_frames))],
+                        rr.Scalar.columns(scalar=velocities))
+    
+    # Log height
+    rr.send_columns("metrics/height", [frame_times], rr.Scalar.columns(scalar=heights))
+    
+    # Log joint angles (first 3 for demo)
+    for i in range(min(3, frames_np.shape[1] - 6)):
+        rr.send_columns(f"metrics/joint_{i}", [frame_times], rr.Scalar.columns(scalar=frames_np[:, 6 + i]))
     
     print(f"\nVisualized {len(motion.frames)} frames")
     print("Rerun viewer opened - use timeline to scrub through frames!")
     print("Features:")
-    print("  - Click joints to see their transforms")
+    print("  - Click joints to see their names and positions")
     print("  - Toggle layers on/off in the blueprint panel")
     print("  - Scrub timeline to see motion")
     print("  - View metrics in time series panel")